@@ -17,6 +17,8 @@ class Network:
     -------
     add_node(node):
         Adds a node to the network.
+    insert_node(node):
+        Adds a node to the network and connects it to every node already in the network.
     get_node(name):
         Returns a node with the specified name from the network.
     """
@@ -66,7 +68,7 @@ class Network:
                 return node
         return None
 
-    def search_resort(self, resort_name):
+    def search_resort(self, resort_name, partial=False):
         """
         Search for a resort in the network by name, allowing for close matches.
 
@@ -74,6 +76,9 @@ class Network:
         ----------
         resort_name : str
             The name of the resort to search for.
+        partial : bool
+            If True, match the name against any part of the resort names, so
+            "Ischgl" finds "Ischgl/Samnaun – Silvretta Arena".
 
         Returns
         -------
@@ -84,7 +89,10 @@ class Network:
         best_match = None
 
         for node in self.nodes:
-            ratio = fuzz.ratio(node.name.lower(), resort_name.lower())
+            if partial:
+                ratio = fuzz.partial_ratio(node.name.lower(), resort_name.lower())
+            else:
+                ratio = fuzz.ratio(node.name.lower(), resort_name.lower())
             if ratio > max_ratio:
                 max_ratio = ratio
                 best_match = node
@@ -106,6 +114,25 @@ class Network:
                 distance = Network.calculate_distance(node.latitude, node.longitude, other_node.latitude, other_node.longitude)
                 node.add_connection(other_node, distance)
 
+    def insert_node(self, node):
+        """
+        Adds a node to the network and connects it to every node already in the network.
+
+        Connections are added in both directions, so inserting nodes one at a time
+        gives the same connections as adding them all and then calling add_connections
+        for each, with half the distance calculations.
+
+        Parameters
+        ----------
+        node : Node
+            a node to be added to the network
+        """
+        for other_node in self.nodes:
+            distance = Network.calculate_distance(node.latitude, node.longitude, other_node.latitude, other_node.longitude)
+            node.add_connection(other_node, distance)
+            other_node.add_connection(node, distance)
+        self.nodes.append(node)
+
     @staticmethod
     def calculate_distance(lat1, lon1, lat2, lon2):
         """
@@ -198,6 +225,8 @@ class Node:
         country of the node
     state_province : str
         state or province of the node
+    currency : str
+        currency used at the node
     snow_reliability : float
         snow reliability of the node
     apres_ski : float
@@ -220,6 +249,14 @@ class Node:
         black runs of the node
     propotion_of_black_runs : float
         proportion of black runs of the node
+    snow_trend : float
+        change in snow depth over the last week, on a 0-5 scale
+    base_stability : float
+        steadiness of the snow base over the last month, on a 0-5 scale
+    raw_score : float
+        sum of the weighted factors from the last score calculation
+    num_factors : int
+        number of factors counted in the last score calculation
 
     Methods
     -------
@@ -227,10 +264,10 @@ class Node:
         Adds a connection to another node with a specified distance.
     """
     def __init__(self):
-        __slots__ = ('name', 'score', 'connections', 'url', 'km_freeride', 'continent', 'country', 'state_province', 
+        __slots__ = ('name', 'score', 'connections', 'url', 'km_freeride', 'continent', 'country', 'state_province', 'currency', 
                 'snow_reliability', 'apres_ski', 'latitude', 'longitude', 'resort_size', 'variety_of_runs', 
                 'cleanliness', 'green_runs', 'blue_runs', 'black_runs', 'propotion_of_black_runs', 
-                'normalized_snow_depth')
+                'normalized_snow_depth', 'snow_trend', 'base_stability', 'raw_score', 'num_factors')
         """
         Constructs all the necessary attributes for the node object.
         """
@@ -242,6 +279,7 @@ class Node:
         self.continent = None
         self.country = None
         self.state_province = None
+        self.currency = None
         self.snow_reliability = None
         self.apres_ski = None
         self.latitude = None
@@ -254,6 +292,10 @@ class Node:
         self.black_runs = None
         self.propotion_of_black_runs = None
         self.normalized_snow_depth = None
+        self.snow_trend = None
+        self.base_stability = None
+        self.raw_score = 0
+        self.num_factors = 0
     
     def describe(self):
         """
@@ -276,6 +318,8 @@ class Node:
         print(f"Apre Rating: {self.apres_ski}")
         print(f"Snow reliability: {self.snow_reliability}")
         print(f"Normalized Snow depth: {self.normalized_snow_depth}")
+        print(f"Snow trend: {self.snow_trend}")
+        print(f"Base stability: {self.base_stability}")
     
     def describe_search(self):
         """
@@ -297,6 +341,8 @@ class Node:
         print(f"Apre Rating: {self.apres_ski}")
         print(f"Snow reliability: {self.snow_reliability}")
         print(f"Normalized Snow depth: {self.normalized_snow_depth}")
+        print(f"Snow trend: {self.snow_trend}")
+        print(f"Base stability: {self.base_stability}")
 
     def calculate_proportion_of_black_runs(self):
         """
@@ -318,7 +364,7 @@ class Node:
             return None
 
     @classmethod
-    def from_resort(cls, resort, cache):
+    def from_resort(cls, resort, cache=None, history=None):
         node = cls()
         node.name = resort["NameResort"]
         node.url = resort["URL"]
@@ -329,6 +375,9 @@ class Node:
         node.score = 0
         node.connections = {}
         node.continent = resort["Continent"]
+        node.country = resort["Country"]
+        node.state_province = resort["State/Province"]
+        node.currency = resort["Currency"]
         node.snow_reliability = utl.to_int(utl.clean_string(resort["Snow reliability "]))
         node.apres_ski = utl.to_int(utl.clean_string(resort["Après-ski "]))
         node.resort_size = utl.to_int(utl.clean_string(resort["Ski resort size "]))
@@ -338,12 +387,74 @@ class Node:
         node.blue_runs = utl.to_int(resort["Intermediate "])
         node.black_runs = utl.to_int(resort["Difficult"])
         node.propotion_of_black_runs = node.calculate_proportion_of_black_runs()
-        try:
-            node.current_snow = cache[node.name]
-        except:
-            node.current_snow = get_snow_data(node.name)
-            cache[node.name] = node.current_snow
+        node.current_snow = None
+        if cache is not None:
+            node.load_snow(cache, history)
         return node
+
+    def load_snow(self, cache, history=None):
+        """
+        Sets the current snow depth from the cache, fetching and caching it if missing.
+
+        Parameters
+        ----------
+        cache : dict
+            a dictionary mapping resort names to snow depths
+        history : SnowHistory
+            an optional snow depth history that fetched depths are appended to
+        """
+        if self.fetch_snow(cache):
+            self.store_snow(cache, history)
+        if history is not None:
+            self.load_snow_features(history)
+
+    def fetch_snow(self, cache):
+        """
+        Sets the current snow depth from the cache, or from the API if the cache has none.
+
+        Parameters
+        ----------
+        cache : dict
+            a dictionary mapping resort names to snow depths
+
+        Returns
+        -------
+        bool
+            True if the depth was fetched from the API and still needs to be stored
+        """
+        try:
+            self.current_snow = cache[self.name]
+            return False
+        except KeyError:
+            self.current_snow = get_snow_data(self.name)
+            return True
+
+    def store_snow(self, cache, history=None):
+        """
+        Stores the current snow depth in the cache and appends it to the history.
+
+        Parameters
+        ----------
+        cache : dict
+            a dictionary mapping resort names to snow depths
+        history : SnowHistory
+            an optional snow depth history
+        """
+        cache[self.name] = self.current_snow
+        if history is not None:
+            history.append(self.name, self.current_snow)
+
+    def load_snow_features(self, history):
+        """
+        Sets the snow trend and base stability from the snow depth history.
+
+        Parameters
+        ----------
+        history : SnowHistory
+            the snow depth history
+        """
+        self.snow_trend = history.trend(self.name)
+        self.base_stability = history.base_stability(self.name)
     
 
 
@@ -382,6 +493,11 @@ class Node:
             score += self.normalized_snow_depth
             num_factors += 1
 
+        for snow_feature in (self.snow_trend, self.base_stability):
+            if snow_feature is not None:
+                score += snow_feature
+                num_factors += 1
+
         for factor, priority in factors:
             factor_value = getattr(self, factor, None)
             if factor_value is not None:
@@ -394,6 +510,9 @@ class Node:
                     score += other_node.score
                     num_factors += 1
 
+        self.raw_score = score
+        self.num_factors = num_factors
+
         if score == 0:
             return 0
 
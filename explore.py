@@ -0,0 +1,155 @@
+import heapq
+from array import array
+
+
+class PriorityExplorer:
+    """
+    A class to explore how changing one priority changes the resort ranking.
+
+    ...
+
+    A node's score is the sum of its weighted factors divided by the number of
+    factors counted, so changing the priority of one factor by delta changes
+    every score by delta * factor value / number of factors. The explorer keeps
+    the scores and these per-factor columns in flat arrays, so an adjustment is
+    a single pass over the arrays followed by a top-k selection, without
+    recalculating any node or revisiting its connections. The contribution of
+    nearby resorts stays as it was in the last calculate_score call.
+
+    Attributes
+    ----------
+    nodes : list
+        the explored nodes, scored with calculate_score beforehand
+    priorities : dict
+        a dictionary mapping each factor to its current priority
+    scores : array
+        the current score of each node
+    columns : dict
+        a dictionary mapping each factor to an array of its per-node score weights
+    k : int
+        the number of top resorts to keep
+
+    Methods
+    -------
+    set_priority(factor, priority):
+        Changes the priority of one factor and returns the new top resorts.
+    top():
+        Returns the current top resorts, best first.
+    ranking():
+        Returns the current top resorts with their scores, best first.
+    apply():
+        Writes the current scores back to the nodes.
+    """
+
+    def __init__(self, nodes, priorities, k=5):
+        """
+        Builds the score arrays from the last calculate_score call of each node.
+
+        Parameters
+        ----------
+        nodes : list
+            the nodes to explore
+        priorities : list of tuples
+            the (factor, priority) tuples the nodes were scored with
+        k : int
+            the number of top resorts to keep
+        """
+        self.nodes = list(nodes)
+        self.priorities = dict(priorities)
+        self.k = k
+        self.scores = array("d", (PriorityExplorer._base_score(node) for node in self.nodes))
+        self.columns = {}
+        for factor in self.priorities:
+            column = array("d", bytes(8 * len(self.nodes)))
+            for position, node in enumerate(self.nodes):
+                value = getattr(node, factor, None)
+                if value is not None and node.num_factors >= 2:
+                    column[position] = value / node.num_factors
+            self.columns[factor] = column
+        self._top = self._select()
+
+    @staticmethod
+    def _base_score(node):
+        """
+        Returns the score a node got from its last calculate_score call.
+        """
+        if node.raw_score == 0 or node.num_factors < 2:
+            return 0.0
+        return node.raw_score / node.num_factors
+
+    def _select(self):
+        """
+        Returns the positions of the k highest non-zero scores, best first.
+
+        An adjustment can move every score, so the top k are selected again
+        with one O(n log k) pass rather than kept in a heap across updates.
+        """
+        scores = self.scores
+        return heapq.nlargest(self.k, (position for position in range(len(scores)) if scores[position] != 0),
+                              key=scores.__getitem__)
+
+    def set_priority(self, factor, priority):
+        """
+        Changes the priority of one factor and returns the new top resorts.
+
+        Parameters
+        ----------
+        factor : str
+            the factor to change
+        priority : float
+            the new priority, between 0 and 1
+
+        Returns
+        -------
+        list
+            the top resorts, best first
+
+        Raises
+        ------
+        ValueError
+            if the factor is unknown or the priority is not between 0 and 1
+        """
+        if factor not in self.priorities:
+            raise ValueError(f"Unknown factor: {factor}")
+        if not 0 <= priority <= 1:
+            raise ValueError("Priority must be between 0 and 1.")
+
+        delta = priority - self.priorities[factor]
+        self.priorities[factor] = priority
+        if delta:
+            scores = self.scores
+            for position, weight in enumerate(self.columns[factor]):
+                if weight:
+                    scores[position] += delta * weight
+            self._top = self._select()
+        return self.top()
+
+    def top(self):
+        """
+        Returns the current top resorts, best first.
+
+        Returns
+        -------
+        list
+            the top resorts
+        """
+        return [self.nodes[position] for position in self._top]
+
+    def ranking(self):
+        """
+        Returns the current top resorts with their scores, best first.
+
+        Returns
+        -------
+        list of tuples
+            a list of (node, score) tuples
+        """
+        return [(self.nodes[position], self.scores[position]) for position in self._top]
+
+    def apply(self):
+        """
+        Writes the current scores back to the nodes.
+        """
+        for node, score in zip(self.nodes, self.scores):
+            node.score = score
+
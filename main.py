@@ -1,7 +1,12 @@
 import utility as utl
 from data_structure import *
+from snow_history import SnowHistory
+from query import QueryEngine, parse_query
+from explore import PriorityExplorer
+from pipeline import build_network
 from tqdm import tqdm
 import os
+import time
 
 def choose_continent():
     """
@@ -35,6 +40,83 @@ def get_path_choice():
         else:
             print("Invalid choice. Please try again.")
 
+def get_query_matches(network, engine):
+    """
+    Prompts the user for optional filters and returns the resorts matching all of them.
+
+    Filters are comma separated conditions on resort attributes, for example
+    "stars>=4, snow_reliability>=4, km_freeride>=50, country=Austria, near=Ischgl:150".
+    The resort data only has country level coordinates, so near matches the
+    resorts of countries whose center is within the distance.
+
+    Args:
+        network (Network): The network used to look up the resort of a near condition.
+        engine (QueryEngine): The query engine indexing the network's nodes.
+
+    Returns:
+        list: The matching resorts, never empty.
+        None: If the user did not enter any filters.
+
+    """
+    print("\nFilter on " + ", ".join(QueryEngine.CATEGORICAL + QueryEngine.NUMERIC) + " or near=<resort>:<km>.")
+    while True:
+        text = input("Enter filters separated by commas, or press enter to skip: ")
+        if not text.strip():
+            return None
+        try:
+            conditions, near = parse_query(text)
+            if near is not None:
+                name, max_distance = near
+                center = network.search_resort(name, partial=True)
+                if center is None:
+                    print(f"No resort found with the name {name}. Please try again.")
+                    continue
+                near = (center.latitude, center.longitude, max_distance)
+            matches = engine.filter(conditions, near)
+        except ValueError as error:
+            print(f"{error} Please try again.")
+            continue
+        if not matches:
+            print("No resorts match your filters. Please try again.")
+            continue
+        print(f"{len(matches)} resorts match your filters.")
+        return matches
+
+def explore_priorities(explorer):
+    """
+    Lets the user adjust one priority at a time and shows the new top resorts after each change.
+
+    Args:
+        explorer (PriorityExplorer): The explorer holding the current scores.
+
+    Returns:
+        list: The top resorts for the final priorities.
+
+    """
+    factors = list(explorer.priorities)
+    while True:
+        print("\nCurrent priorities:")
+        for i, factor in enumerate(factors, start=1):
+            print(f"{i}. {factor}: {explorer.priorities[factor]}")
+        factor_choice = input("Enter the number of the factor to adjust, or 'q' to stop exploring: ")
+        if factor_choice.lower() == 'q':
+            explorer.apply()
+            return explorer.top()
+        try:
+            factor = factors[int(factor_choice) - 1]
+        except (IndexError, ValueError):
+            print("Invalid choice. Please try again.")
+            continue
+
+        priority = utl.get_priority_input(f"Enter a new priority for {factor} (0-1): ")
+        start = time.perf_counter()
+        explorer.set_priority(factor, priority)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        print(f"\nTop {explorer.k} resorts (updated in {elapsed:.2f} ms):")
+        for i, (node, score) in enumerate(explorer.ranking(), start=1):
+            print(f"{i}. {node.name} - Score: {score}")
+
 def select_resort(top_resorts):
     """
     Prompts the user to select a resort from a list of top resorts.
@@ -82,9 +164,10 @@ def main():
         # If the file is not found, create an empty cache
         cache = {}
 
+    history = SnowHistory()
+
     resorts = utl.read_csv_to_dicts("resortworldwide.csv")
     while True:
-        nodes = []
         continent = choose_continent()
         # print("List of continents: Africa, Antarctica, Asia, Europe, North America, Oceania, South America")
 
@@ -96,24 +179,15 @@ def main():
         #         print("Invalid continent. Please try again.")
 
         resorts_in_continent = [resort for resort in resorts if resort["Continent"].lower().strip() == continent.lower().strip()]
-        print(f"Found {len(resorts_in_continent)} resorts in {continent}. \n Getting snow data...")
+        print(f"Found {len(resorts_in_continent)} resorts in {continent}. \n Getting snow data and connecting resorts...")
 
-        for resort in tqdm(resorts_in_continent):
-            node = Node.from_resort(resort, cache=cache)
-            nodes.append(node)
-
-        utl.write_json(cache_file, cache)
+        nodes = build_network(network, resorts_in_continent, cache, history, cache_file)
 
         max_snow_depth = max([node.current_snow for node in nodes if node.current_snow is not None])
 
-        print(f"\nAdding Nodes...")
-        for node in tqdm(nodes):
+        for node in nodes:
             node.normalized_snow_depth = (node.current_snow / max_snow_depth * 5) if node.current_snow is not None else None
-            network.add_node(node)
-
-        print(f"\nConnecting resorts...")
-        for node in tqdm(nodes):
-            network.add_connections(node)
+        engine = QueryEngine(network.nodes)
         path_choice = get_path_choice()
 
 
@@ -126,17 +200,26 @@ def main():
                 priorities.append((factor, priority))
 
             distance = utl.get_distance_input("Enter a distance in kilometers: ")
+            matches = get_query_matches(network, engine)
 
             print("\nCalculating scores...")
             for node in tqdm(network.nodes):
                 node.calculate_score(priorities, distance)
 
 
+            # The explorer ranks both the first top 5 and any adjusted ones, so they compare like for like
+            explorer = PriorityExplorer(network.nodes if matches is None else matches, priorities)
+            explorer.apply()
+            top_resorts = explorer.top()
+
             print("\nTop 5 resorts:")
-            top_resorts = network.get_high_score()[-5:][::-1]  # Get the last 5 resorts and reverse the order
+            for i, (node, score) in enumerate(explorer.ranking(), start=1):
+                print(f"{i}. {node.name} - Score: {score}")
+
+            explore = input("\nWould you like to adjust your priorities and compare? (y/n): ")
+            if explore.lower() == 'y':
+                top_resorts = explore_priorities(explorer)
 
-            for i, node in enumerate(top_resorts, start=1):
-                print(f"{i}. {node.name} - Score: {node.score}")
             while True:
                 resort_choice = input("\nPlease enter the number of the resort you want to learn more about, or 'q' to quit: ")
 
@@ -166,5 +249,7 @@ def main():
         if restart.lower() != 'y':
             break
 
+    history.close()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
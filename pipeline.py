@@ -0,0 +1,136 @@
+import queue
+import threading
+import utility as utl
+from data_structure import Node
+from tqdm import tqdm
+
+
+def build_network(network, resorts, cache, history, cache_file, fetch_workers=8, queue_size=64, save_every=100):
+    """
+    Builds the nodes of the given resorts and inserts them into the network, running every stage at once.
+
+    The stages are connected by bounded queues and each runs in its own thread:
+    parsing the resort rows, fetching missing snow depths (several threads, as
+    this waits on the API), persisting fetched depths to the cache and the snow
+    history, and inserting the nodes into the network with their connections.
+    The build therefore takes about as long as its slowest stage. Snow depths
+    are not normalized here, since that needs the depths of every resort.
+
+    Args:
+        network (Network): The network the nodes are inserted into.
+        resorts (list): The resort rows to build nodes from.
+        cache (dict): A dictionary mapping resort names to snow depths.
+        history (SnowHistory): An optional snow depth history that fetched depths are appended to.
+        cache_file (str): The path the cache is saved to.
+        fetch_workers (int): The number of threads fetching snow depths.
+        queue_size (int): The maximum number of nodes waiting between two stages.
+        save_every (int): The number of fetched depths after which the cache is saved.
+
+    Returns:
+        list: The new nodes, in the order of the resort rows.
+
+    Raises:
+        Exception: The first error raised by any of the stages.
+        KeyboardInterrupt: If the build is interrupted, once the stages have stopped and
+            the depths fetched so far have been saved.
+    """
+    to_fetch = queue.Queue(queue_size)
+    to_persist = queue.Queue(queue_size)
+    to_insert = queue.Queue(queue_size)
+    positions = {}
+    errors = []
+    start = len(network.nodes)
+
+    def parse():
+        try:
+            for position, resort in enumerate(resorts):
+                node = Node.from_resort(resort)
+                positions[node] = position
+                to_fetch.put(node)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            for _ in range(fetch_workers):
+                to_fetch.put(None)
+
+    def fetch():
+        # Keep draining after an error so the stage upstream never blocks on a full queue
+        while True:
+            node = to_fetch.get()
+            if node is None:
+                break
+            if errors:
+                continue
+            try:
+                fetched = node.fetch_snow(cache)
+                to_persist.put((node, fetched))
+            except Exception as error:
+                errors.append(error)
+        to_persist.put(None)
+
+    def persist():
+        finished = 0
+        unsaved = 0
+        while finished < fetch_workers:
+            item = to_persist.get()
+            if item is None:
+                finished += 1
+                continue
+            if errors:
+                continue
+            try:
+                node, fetched = item
+                if fetched:
+                    node.store_snow(cache, history)
+                    unsaved += 1
+                    if unsaved >= save_every:
+                        utl.write_json(cache_file, cache)
+                        unsaved = 0
+                if history is not None:
+                    node.load_snow_features(history)
+                to_insert.put(node)
+            except Exception as error:
+                errors.append(error)
+        try:
+            if unsaved:
+                utl.write_json(cache_file, cache)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            to_insert.put(None)
+
+    def insert():
+        with tqdm(total=len(resorts)) as progress:
+            while True:
+                node = to_insert.get()
+                if node is None:
+                    break
+                if errors:
+                    continue
+                try:
+                    network.insert_node(node)
+                    progress.update()
+                except Exception as error:
+                    errors.append(error)
+
+    threads = [threading.Thread(target=parse), threading.Thread(target=persist), threading.Thread(target=insert)]
+    threads += [threading.Thread(target=fetch) for _ in range(fetch_workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except BaseException as interrupt:
+        # On Ctrl-C every stage sees the error, stops fetching and drains its queue
+        errors.append(interrupt)
+        for thread in threads:
+            thread.join()
+        raise
+
+    if errors:
+        raise errors[0]
+
+    # Nodes reach the network in the order their snow depths arrived
+    nodes = sorted(positions, key=positions.get)
+    network.nodes[start:] = nodes
+    return nodes
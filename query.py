@@ -0,0 +1,226 @@
+import re
+import bisect
+from data_structure import Network
+
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+CONDITION_PATTERN = re.compile(r"^\s*([a-z_]+)\s*(>=|<=|!=|=|<|>)\s*(.+?)\s*$")
+
+
+def parse_query(text):
+    """
+    Parses a comma separated query such as "stars>=4, country=Austria, near=Ischgl:150".
+
+    Args:
+        text (str): The query entered by the user.
+
+    Returns:
+        conditions (list): A list of (attribute, operator, value) tuples.
+        near (tuple): A (resort name, max distance) tuple, or None if the query has no near condition.
+
+    Raises:
+        ValueError: If a condition cannot be parsed.
+    """
+    conditions = []
+    near = None
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        match = CONDITION_PATTERN.match(part.lower())
+        if match is None:
+            raise ValueError(f"Invalid condition: {part.strip()}")
+        attribute, operator, value = match.groups()
+        if attribute == "near":
+            name, _, distance = value.rpartition(":")
+            if operator != "=" or not name:
+                raise ValueError("Use near=<resort name>:<distance in km>.")
+            near = (name.strip(), float(distance))
+        elif attribute in QueryEngine.CATEGORICAL:
+            conditions.append((attribute, operator, value))
+        elif attribute in QueryEngine.NUMERIC:
+            try:
+                conditions.append((attribute, operator, float(value)))
+            except ValueError:
+                raise ValueError(f"{attribute} needs a number, not {value}.")
+        else:
+            raise ValueError(f"Unknown attribute: {attribute}")
+    return conditions, near
+
+
+class QueryEngine:
+    """
+    A class to filter the nodes of a network on several attributes at once.
+
+    ...
+
+    Every node gets a position in the engine. Categorical attributes are
+    indexed as one bitmap per value, numeric attributes as a list of values
+    sorted alongside their positions. Each condition of a query is turned
+    into a bitmap of matching positions and the bitmaps are intersected, so
+    only the final matches are ever visited. Nodes without a value for an
+    attribute never match a condition on it, including != conditions.
+
+    The latitude and longitude in resortworldwide.csv are the center of the
+    resort's country rather than of the resort, so a near filter compares
+    countries, not individual resorts.
+
+    Attributes
+    ----------
+    nodes : list
+        the indexed nodes, in position order
+    categorical : dict
+        a dictionary mapping each categorical attribute to a dictionary of value bitmaps
+    present : dict
+        a dictionary mapping each categorical attribute to the bitmap of nodes with a value
+    numeric : dict
+        a dictionary mapping each numeric attribute to a (sorted values, positions) tuple
+
+    Methods
+    -------
+    filter(conditions, near=None):
+        Returns the nodes matching every condition.
+    """
+
+    CATEGORICAL = ("continent", "country", "state_province", "currency")
+    NUMERIC = ("stars", "km_freeride", "snow_reliability", "apres_ski", "resort_size", "variety_of_runs",
+               "cleanliness", "green_runs", "blue_runs", "black_runs", "propotion_of_black_runs",
+               "current_snow", "normalized_snow_depth", "snow_trend", "base_stability", "latitude", "longitude")
+
+    def __init__(self, nodes):
+        """
+        Builds the indexes over the given nodes.
+
+        Parameters
+        ----------
+        nodes : list
+            the nodes to index
+        """
+        self.nodes = list(nodes)
+        self.all = (1 << len(self.nodes)) - 1
+        self.categorical = {}
+        self.present = {}
+        self.numeric = {}
+
+        for attribute in QueryEngine.CATEGORICAL:
+            bitmaps = {}
+            present = 0
+            for position, node in enumerate(self.nodes):
+                value = getattr(node, attribute, None)
+                key = value.lower().strip() if value is not None else ""
+                if key:
+                    bitmaps[key] = bitmaps.get(key, 0) | (1 << position)
+                    present |= 1 << position
+            self.categorical[attribute] = bitmaps
+            self.present[attribute] = present
+
+        for attribute in QueryEngine.NUMERIC:
+            pairs = []
+            for position, node in enumerate(self.nodes):
+                value = getattr(node, attribute, None)
+                if value is not None:
+                    pairs.append((value, position))
+            pairs.sort()
+            self.numeric[attribute] = ([value for value, _ in pairs], [position for _, position in pairs])
+
+    def _to_bitmap(self, positions):
+        """
+        Returns a bitmap with the bits of the given positions set.
+        """
+        bits = bytearray((len(self.nodes) + 7) // 8)
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, "little")
+
+    def _to_nodes(self, bitmap):
+        """
+        Returns the nodes whose bits are set in the bitmap, in position order.
+        """
+        nodes = []
+        for index, byte in enumerate(bitmap.to_bytes((len(self.nodes) + 7) // 8, "little")):
+            while byte:
+                low = byte & -byte
+                nodes.append(self.nodes[(index << 3) + low.bit_length() - 1])
+                byte ^= low
+        return nodes
+
+    def _match(self, attribute, operator, value):
+        """
+        Returns the bitmap of positions matching a single condition.
+
+        Raises
+        ------
+        ValueError
+            if the attribute or operator is not supported
+        """
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown operator: {operator}")
+
+        if attribute in self.categorical:
+            if operator not in ("=", "!="):
+                raise ValueError(f"{attribute} only supports = and !=.")
+            bitmap = self.categorical[attribute].get(str(value).lower().strip(), 0)
+            return bitmap if operator == "=" else self.present[attribute] & ~bitmap
+
+        if attribute not in self.numeric:
+            raise ValueError(f"Unknown attribute: {attribute}")
+
+        values, positions = self.numeric[attribute]
+        low, high = 0, len(values)
+        if operator in (">=", "=", "!="):
+            low = bisect.bisect_left(values, value)
+        elif operator == ">":
+            low = bisect.bisect_right(values, value)
+        if operator in ("<=", "=", "!="):
+            high = bisect.bisect_right(values, value)
+        elif operator == "<":
+            high = bisect.bisect_left(values, value)
+
+        if operator == "!=":
+            return self._to_bitmap(positions[:low]) | self._to_bitmap(positions[high:])
+        return self._to_bitmap(positions[low:high])
+
+    def filter(self, conditions, near=None):
+        """
+        Returns the nodes matching every condition.
+
+        Parameters
+        ----------
+        conditions : list of tuples
+            a list of (attribute, operator, value) tuples
+        near : tuple
+            an optional (latitude, longitude, max distance) tuple restricting the
+            results to nodes within max distance kilometers of the point, using
+            the country level coordinates of the nodes
+
+        Returns
+        -------
+        list
+            the matching nodes
+
+        Raises
+        ------
+        ValueError
+            if a condition uses an unsupported attribute or operator
+        """
+        bitmap = self.all
+        for attribute, operator, value in conditions:
+            bitmap &= self._match(attribute, operator, value)
+            if not bitmap:
+                return []
+
+        if near is None:
+            return self._to_nodes(bitmap)
+
+        # Narrow to a latitude band through the index before computing exact distances
+        latitude, longitude, max_distance = near
+        band = max_distance / 111.0
+        bitmap &= self._match("latitude", ">=", latitude - band)
+        bitmap &= self._match("latitude", "<=", latitude + band)
+        matches = []
+        for node in self._to_nodes(bitmap):
+            distance = Network.calculate_distance(latitude, longitude, node.latitude, node.longitude)
+            # calculate_distance returns None for the reference point itself
+            if distance is None and (node.latitude, node.longitude) == (latitude, longitude):
+                distance = 0.0
+            if distance is not None and distance <= max_distance:
+                matches.append(node)
+        return matches
@@ -0,0 +1,362 @@
+import os
+import mmap
+import struct
+import bisect
+from array import array
+from datetime import date
+
+# One record per observed day: resort id, days since that resort's previous
+# record, and the change in snow depth. Packed without padding, so a record
+# is 4 bytes.
+RECORD = struct.Struct("<HBb")
+# An escape record is followed by a record holding the absolute depth as an int16
+ABSOLUTE = struct.Struct("<Hh")
+ESCAPE = -128
+# A gap record only moves the day forward, it is not an observation
+GAP = -127
+MIN_CHANGE = -126
+MAX_CHANGE = 127
+MAX_DAY_DELTA = 255
+MIN_DEPTH = -32768
+MAX_DEPTH = 32767
+# Features need an observation at most this many days before the scored day
+MAX_STALE_DAYS = 1
+
+
+class SnowHistory:
+    """
+    An append-only time series store of snow depths for every resort.
+
+    ...
+
+    Samples are kept in two files. The index file lists one resort per line
+    as "<first day>\\t<name>", the line number being the resort id. The data
+    file is a flat log of fixed size records (resort id, day delta, depth
+    change), one per day a resort was observed, where the day delta is the
+    number of days since the previous record of the same resort. Depth changes
+    that do not fit in an int8, and the first depth of a resort, are written as
+    an escape record followed by a record holding the absolute int16 depth.
+    Gaps longer than a day delta can hold are bridged by gap records, which
+    are not observations. On startup the data file is memory-mapped and
+    decoded once into per-resort arrays, which answer range queries with a
+    binary search.
+
+    Attributes
+    ----------
+    path : str
+        path of the binary data file
+    index_path : str
+        path of the resort index file
+    ids : dict
+        a dictionary mapping resort names to resort ids
+    days : list
+        per-resort arrays of observed days (date ordinals)
+    depths : list
+        per-resort arrays of observed depths
+
+    Methods
+    -------
+    append(name, depth, day=None):
+        Records a snow depth observation for a resort.
+    depth_at(name, day=None):
+        Returns the last observed snow depth of a resort on or before the given day.
+    between(name, start, end):
+        Returns the observations of a resort between two days.
+    trend(name, window=7, day=None):
+        Returns the change in snow depth over the window, on a 0-5 scale.
+    base_stability(name, window=30, day=None):
+        Returns how steady the snow base was over the window, on a 0-5 scale.
+    """
+
+    def __init__(self, path="snow_history.bin", index_path="snow_history.idx"):
+        """
+        Loads the existing history and opens the files for appending.
+
+        Parameters
+        ----------
+        path : str
+            path of the binary data file
+        index_path : str
+            path of the resort index file
+        """
+        self.path = path
+        self.index_path = index_path
+        self.ids = {}
+        self.cursors = []
+        self.days = []
+        self.depths = []
+        self._load()
+        self._index_file = open(self.index_path, "a", encoding="utf-8")
+        self._data_file = open(self.path, "ab")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Flushes and closes the underlying files.
+        """
+        self._index_file.close()
+        self._data_file.close()
+
+    def _load(self):
+        """
+        Reads the index file and decodes the memory-mapped data file into per-resort arrays.
+        """
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as file_obj:
+                for line in file_obj:
+                    first_day, name = line.rstrip("\n").split("\t", 1)
+                    self._add_resort(name, int(first_day))
+
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+
+        size = 0
+        with open(self.path, "rb") as file_obj:
+            with mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)[:len(mapped) - len(mapped) % RECORD.size]
+                try:
+                    records = RECORD.iter_unpack(view)
+                    for resort_id, day_delta, change in records:
+                        record_size = RECORD.size
+                        if change == ESCAPE:
+                            following = next(records, None)
+                            if following is None:
+                                break
+                            record_size += RECORD.size
+                            # Reinterpret the following record's last two bytes as an int16
+                            change = following[1] | (following[2] << 8)
+                        size += record_size
+                        if resort_id < len(self.days):
+                            self._decode(resort_id, day_delta, change, record_size > RECORD.size)
+                finally:
+                    view.release()
+
+        # Drop a partially written trailing record so later appends stay aligned
+        if size != os.path.getsize(self.path):
+            os.truncate(self.path, size)
+
+    def _add_resort(self, name, first_day):
+        """
+        Registers a resort in memory and returns its id.
+        """
+        resort_id = len(self.days)
+        self.ids[name] = resort_id
+        self.cursors.append(first_day)
+        self.days.append(array("l"))
+        self.depths.append(array("h"))
+        return resort_id
+
+    def _decode(self, resort_id, day_delta, change, absolute):
+        """
+        Applies one decoded record to the in-memory arrays of a resort.
+        """
+        self.cursors[resort_id] += day_delta
+        if change == GAP and not absolute:
+            return
+        depths = self.depths[resort_id]
+        depth = change if absolute else depths[-1] + change
+        self.days[resort_id].append(self.cursors[resort_id])
+        depths.append(depth)
+
+    def _encode(self, resort_id, day, depth):
+        """
+        Returns the records for one observation and applies them to the in-memory arrays.
+        """
+        records = b""
+        while day - self.cursors[resort_id] > MAX_DAY_DELTA:
+            records += RECORD.pack(resort_id, MAX_DAY_DELTA, GAP)
+            self._decode(resort_id, MAX_DAY_DELTA, GAP, False)
+
+        day_delta = day - self.cursors[resort_id]
+        depths = self.depths[resort_id]
+        if depths and MIN_CHANGE <= depth - depths[-1] <= MAX_CHANGE:
+            records += RECORD.pack(resort_id, day_delta, depth - depths[-1])
+            self._decode(resort_id, day_delta, depth - depths[-1], False)
+        else:
+            records += RECORD.pack(resort_id, day_delta, ESCAPE) + ABSOLUTE.pack(resort_id, depth)
+            self._decode(resort_id, day_delta, depth, True)
+        return records
+
+    def append(self, name, depth, day=None):
+        """
+        Records a snow depth observation for a resort.
+
+        Parameters
+        ----------
+        name : str
+            name of the resort
+        depth : int
+            snow depth, None values are ignored
+        day : int
+            date ordinal of the observation, defaults to today
+
+        Returns
+        -------
+        bool
+            True if a record was written, False if the observation was ignored
+            or repeats the last observation of the same day
+
+        Raises
+        ------
+        ValueError
+            if the day is earlier than the last record of the resort
+        """
+        if depth is None:
+            return False
+        if day is None:
+            day = date.today().toordinal()
+        depth = max(MIN_DEPTH, min(MAX_DEPTH, int(depth)))
+
+        resort_id = self.ids.get(name)
+        # A resort indexed without any observation (e.g. after a crash) is registered again,
+        # the later index line replaces the earlier one on load
+        if resort_id is None or not self.days[resort_id]:
+            resort_id = self._add_resort(name, day)
+            self._index_file.write(f"{day}\t{name}\n")
+            self._index_file.flush()
+        else:
+            days = self.days[resort_id]
+            if day < self.cursors[resort_id]:
+                raise ValueError(f"Sample for {name} is older than its last stored sample.")
+            if day == days[-1] and depth == self.depths[resort_id][-1]:
+                return False
+
+        self._data_file.write(self._encode(resort_id, day, depth))
+        self._data_file.flush()
+        return True
+
+    def depth_at(self, name, day=None):
+        """
+        Returns the last observed snow depth of a resort on or before the given day.
+
+        Parameters
+        ----------
+        name : str
+            name of the resort
+        day : int
+            date ordinal, defaults to today
+
+        Returns
+        -------
+        int
+            the last observed depth at or before the day
+        None
+            if the resort has no observations up to that day
+        """
+        resort_id = self.ids.get(name)
+        if resort_id is None:
+            return None
+        if day is None:
+            day = date.today().toordinal()
+        position = bisect.bisect_right(self.days[resort_id], day)
+        if position == 0:
+            return None
+        return self.depths[resort_id][position - 1]
+
+    def between(self, name, start, end):
+        """
+        Returns the observations of a resort between two days, inclusive.
+
+        Parameters
+        ----------
+        name : str
+            name of the resort
+        start : int
+            date ordinal of the first day
+        end : int
+            date ordinal of the last day
+
+        Returns
+        -------
+        list of tuples
+            a list of (day, depth) tuples in time order
+        """
+        resort_id = self.ids.get(name)
+        if resort_id is None:
+            return []
+        days = self.days[resort_id]
+        low = bisect.bisect_left(days, start)
+        high = bisect.bisect_right(days, end)
+        return list(zip(days[low:high], self.depths[resort_id][low:high]))
+
+    def _window(self, name, window, day):
+        """
+        Returns the depths observed over the window ending on the given day, or
+        None unless the resort was observed on at least two days of the window,
+        the last of them at most MAX_STALE_DAYS before the day.
+        """
+        if day is None:
+            day = date.today().toordinal()
+        observations = self.between(name, day - window, day)
+        if not observations or day - observations[-1][0] > MAX_STALE_DAYS:
+            return None
+        if observations[0][0] == observations[-1][0]:
+            return None
+        return [depth for _, depth in observations]
+
+    def trend(self, name, window=7, day=None):
+        """
+        Returns the change in snow depth over the window, on a 0-5 scale.
+
+        A value of 2.5 means no change, 5 means the depth grew from nothing
+        to its peak and 0 means it melted from its peak to nothing.
+
+        Parameters
+        ----------
+        name : str
+            name of the resort
+        window : int
+            number of days to look back
+        day : int
+            date ordinal of the last day, defaults to today
+
+        Returns
+        -------
+        float
+            the trend score
+        None
+            if the resort was not observed recently and repeatedly enough
+        """
+        depths = self._window(name, window, day)
+        if depths is None:
+            return None
+        peak = max(abs(depth) for depth in depths)
+        if peak == 0:
+            return 2.5
+        return 2.5 * (1 + (depths[-1] - depths[0]) / peak)
+
+    def base_stability(self, name, window=30, day=None):
+        """
+        Returns how steady the snow base was over the window, on a 0-5 scale.
+
+        The score is the lowest depth of the window relative to its peak, so a
+        base that never thinned scores 5 and one that melted out scores 0.
+
+        Parameters
+        ----------
+        name : str
+            name of the resort
+        window : int
+            number of days to look back
+        day : int
+            date ordinal of the last day, defaults to today
+
+        Returns
+        -------
+        float
+            the stability score
+        None
+            if the resort was not observed recently and repeatedly enough
+        """
+        depths = self._window(name, window, day)
+        if depths is None:
+            return None
+        peak = max(depths)
+        if peak <= 0:
+            return 0.0
+        return 5 * max(min(depths), 0) / peak